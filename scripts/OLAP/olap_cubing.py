@@ -1,4 +1,8 @@
+import functools
+import hashlib
+import numpy as np
 import pandas as pd
+import polars as pl
 import sqlite3
 import pathlib
 import sys
@@ -13,33 +17,98 @@ from utils.logger import logger  # noqa: E402
 # Constants
 DW_DIR: pathlib.Path = pathlib.Path("data").joinpath("dw")
 DB_PATH: pathlib.Path = DW_DIR.joinpath("smart_sales.db")
+SALE_PARQUET_PATH: pathlib.Path = DW_DIR.joinpath("sale.parquet")
 OLAP_OUTPUT_DIR: pathlib.Path = pathlib.Path("data").joinpath("olap_cubing_outputs")
+CUBE_SIGNATURE_PATH: pathlib.Path = OLAP_OUTPUT_DIR.joinpath(".cube.sig")
+CUBE_FILENAMES: list = ["multidimensional_olap_cube.parquet", "multidimensional_olap_cube.csv"]
+
+# Aggregation functions that SQLite can compute for us, keyed by metric name
+SQL_AGGREGATES: dict = {
+    "sum": "SUM",
+    "mean": "AVG",
+    "count": "COUNT",
+    "min": "MIN",
+    "max": "MAX",
+}
 
 # Create output directory if it does not exist
 OLAP_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def ingest_sales_data_from_dw() -> pd.DataFrame:
-    """Ingest sales data from SQLite data warehouse."""
+@functools.lru_cache(maxsize=1)
+def get_dw_connection() -> sqlite3.Connection:
+    """
+    Open the shared read-only connection to the SQLite data warehouse.
+
+    The connection is opened on first use and reused by every later query,
+    so building several cubes does not reopen the database each time.
+    The database is memory-mapped so repeated scans read straight from the page cache.
+    """
+    conn = sqlite3.connect(
+        f"{DB_PATH.resolve().as_uri()}?mode=ro&cache=shared",
+        uri=True,
+        check_same_thread=False,
+        isolation_level=None,
+    )
+    conn.execute("PRAGMA mmap_size=268435456")  # 256 MB
+    return conn
+
+
+def ingest_sales_data_from_dw(columns: list) -> pl.DataFrame:
+    """
+    Ingest sales data from the data warehouse, reading only the given columns.
+
+    Uses the Parquet snapshot written by etl_to_dw.py when it exists,
+    otherwise selects the columns from the SQLite sale table.
+    Only main()'s fallback path calls this, for metrics that SQLite cannot
+    aggregate (see can_push_down); the shipped cube is computed in SQLite.
+
+    Args:
+        columns (list): Sale table columns needed for the cube.
+
+    Returns:
+        pl.DataFrame: The sales data.
+    """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        sales_df = pd.read_sql_query("SELECT * FROM sale", conn)
-        conn.close()
-        logger.info("Sales data successfully loaded from SQLite data warehouse.")
-        return sales_df
+        if SALE_PARQUET_PATH.exists():
+            sales_df = pl.read_parquet(SALE_PARQUET_PATH, columns=columns)
+            logger.info(f"Sales data successfully loaded from {SALE_PARQUET_PATH}.")
+        else:
+            sales_df = pl.read_database(f"SELECT {', '.join(columns)} FROM sale", get_dw_connection())
+            logger.info("Sales data successfully loaded from SQLite data warehouse.")
+
+        # Text dimensions such as payment_type have only a handful of values:
+        # as Categorical the group-by hashes small integer codes, not strings
+        return sales_df.with_columns(pl.col(pl.String).cast(pl.Categorical))
     except Exception as e:
         logger.error(f"Error loading sale table data from data warehouse: {e}")
         raise
 
 
+def metric_aggregations(metrics: dict):
+    """
+    Yield (column, function, output column name) for every metric aggregation.
+
+    Args:
+        metrics (dict): Dictionary of aggregation functions for metrics,
+            e.g. {"sale_amount": ["sum", "mean"], "sale_id": "count"}.
+
+    Yields:
+        tuple: e.g. ("sale_amount", "sum", "sale_amount_sum").
+    """
+    for column, agg_funcs in metrics.items():
+        for func in agg_funcs if isinstance(agg_funcs, list) else [agg_funcs]:
+            yield column, func, f"{column}_{func}".rstrip("_")
+
+
 def create_olap_cube(
-    sales_df: pd.DataFrame, dimensions: list, metrics: dict
+    sales_df: pl.DataFrame, dimensions: list, metrics: dict
 ) -> pd.DataFrame:
     """
     Create an OLAP cube by aggregating data across multiple dimensions.
 
     Args:
-        sales_df (pd.DataFrame): The sales data.
+        sales_df (pl.DataFrame): The sales data.
         dimensions (list): List of column names to group by.
         metrics (dict): Dictionary of aggregation functions for metrics.
 
@@ -47,97 +116,199 @@ def create_olap_cube(
         pd.DataFrame: The multidimensional OLAP cube.
     """
     try:
-        # Group by the specified dimensions and aggregate metrics
-        # When we use the groupby() method in Pandas, 
-        # it creates a hierarchical index (also known as a MultiIndex) for the grouped data. 
-        # This structure reflects the grouping levels but can make the resulting DataFrame 
-        # harder to interact with, especially for tasks like slicing, querying, or merging data. 
-        # Converting the hierarchical index into a flat table by calling reset_index()
-        # simplifies our operations.
-
-        # NOTE: Pandas generates hierarchical column names when we specify 
-        # multiple aggregation functions for a single column. 
-        # If we specify only one aggregation function per column, 
-        # the resulting column names will not include the suffix.
-
-        # Group by the specified dimensions
-        grouped = sales_df.groupby(dimensions)
-
-        # Perform the aggregations
-        cube = grouped.agg(metrics).reset_index()
+        # Build one aliased Polars expression per metric/aggregation pair,
+        # e.g. {"sale_amount": ["sum", "mean"]} becomes
+        # sale_amount.sum() AS sale_amount_sum, sale_amount.mean() AS sale_amount_mean.
+        # Naming the columns up front means no hierarchical (MultiIndex)
+        # columns to flatten and rename afterwards.
+        exprs = [
+            getattr(pl.col(column), func)().alias(name)
+            for column, func, name in metric_aggregations(metrics)
+        ]
 
         # Add a list of sale IDs for traceability
-        cube["sale_ids"] = grouped["sale_id"].apply(list).reset_index(drop=True)
+        exprs.append(pl.col("sale_id").alias("sale_ids"))
 
-        # Generate explicit column names
-        explicit_columns = generate_column_names(dimensions, metrics)
-        explicit_columns.append("sale_ids")  # Include the traceability column
-        cube.columns = explicit_columns
+        # Polars runs the group-by multi-threaded and collects the sale IDs
+        # into a native list column, with no Python-level loop per group.
+        # Sort by the dimensions to keep the row order Pandas produced.
+        cube = (
+            sales_df.lazy()
+            .group_by(dimensions)
+            .agg(exprs)
+            .sort(dimensions)
+            .collect()
+        )
 
         logger.info(f"OLAP cube created with dimensions: {dimensions}")
-        return cube
+
+        # Hand back a Pandas DataFrame for writing to CSV;
+        # to_dict keeps sale_ids as plain Python lists.
+        return pd.DataFrame(cube.to_dict(as_series=False))
     except Exception as e:
         logger.error(f"Error creating OLAP cube: {e}")
         raise
 
-def generate_column_names(dimensions: list, metrics: dict) -> list:
+
+def can_push_down(metrics: dict) -> bool:
+    """Check whether every aggregation in metrics has a SQLite equivalent."""
+    return all(func in SQL_AGGREGATES for _, func, _ in metric_aggregations(metrics))
+
+
+def build_olap_cube_query(dimensions: list, metrics: dict) -> str:
     """
-    Generate explicit column names for OLAP cube, ensuring no trailing underscores.
-    
+    Build the SQL that aggregates the sale table into an OLAP cube.
+
     Args:
-        dimensions (list): List of dimension columns.
-        metrics (dict): Dictionary of metrics with aggregation functions.
-        
+        dimensions (list): List of column names to group by.
+        metrics (dict): Dictionary of aggregation functions for metrics.
+
     Returns:
-        list: Explicit column names.
+        str: SELECT ... GROUP BY statement for the cube.
+    """
+    select_list = [
+        *dimensions,
+        *(
+            f"{SQL_AGGREGATES[func]}({column}) AS {name}"
+            for column, func, name in metric_aggregations(metrics)
+        ),
+    ]
+
+    group_by = ", ".join(dimensions)
+    return (
+        f"SELECT {', '.join(select_list)} FROM sale "
+        f"GROUP BY {group_by} ORDER BY {group_by}"
+    )
+
+
+def collect_sale_ids(ids_df: pd.DataFrame, dimensions: list) -> list:
+    """
+    Split sale IDs into one list per group.
+
+    Args:
+        ids_df (pd.DataFrame): Dimension columns and sale_id, sorted by the dimensions.
+        dimensions (list): List of column names the cube is grouped by.
+
+    Returns:
+        list: One list of sale IDs per group, in the same order as the groups.
+    """
+    if ids_df.empty:
+        return []
+
+    # Rows are already sorted by group, so each group is one contiguous run:
+    # find where the group code changes and split the ID array there
+    codes = ids_df.groupby(dimensions, sort=False, dropna=False).ngroup().to_numpy()
+    boundaries = np.flatnonzero(np.diff(codes)) + 1
+    return [ids.tolist() for ids in np.split(ids_df["sale_id"].to_numpy(), boundaries)]
+
+
+def create_olap_cube_from_dw(dimensions: list, metrics: dict) -> pd.DataFrame:
+    """
+    Create an OLAP cube by aggregating inside the SQLite data warehouse.
+
+    The metrics are computed by SQLite, so apart from the sale_id list
+    only one row per group is read back instead of the whole sale table.
+
+    Args:
+        dimensions (list): List of column names to group by.
+        metrics (dict): Dictionary of aggregation functions for metrics.
+
+    Returns:
+        pd.DataFrame: The multidimensional OLAP cube.
     """
-    # Start with dimensions
-    column_names = dimensions.copy()
-    
-    # Add metrics with their aggregation suffixes
-    for column, agg_funcs in metrics.items():
-        if isinstance(agg_funcs, list):
-            for func in agg_funcs:
-                column_names.append(f"{column}_{func}")
-        else:
-            column_names.append(f"{column}_{agg_funcs}")
-    
-    # Remove trailing underscores from all column names
-    column_names = [col.rstrip("_") for col in column_names]
-    
-    return column_names
-    
-
-def write_cube_to_csv(cube: pd.DataFrame, filename: str) -> None:
-    """Write the OLAP cube to a CSV file."""
+    try:
+        query = build_olap_cube_query(dimensions, metrics)
+        group_by = ", ".join(dimensions)
+        conn = get_dw_connection()
+
+        # Both reads run in one transaction so they see the same snapshot,
+        # even if the ETL commits a reload in between
+        conn.execute("BEGIN")
+        try:
+            cube = pd.read_sql_query(query, conn)
+
+            # Add a list of sale IDs for traceability. The IDs come back as one
+            # numeric column in group order and are split into lists in NumPy.
+            ids_df = pd.read_sql_query(
+                f"SELECT {group_by}, sale_id FROM sale ORDER BY {group_by}, sale_id", conn
+            )
+        finally:
+            conn.execute("COMMIT")
+        cube["sale_ids"] = collect_sale_ids(ids_df, dimensions)
+
+        logger.info(f"OLAP cube created in data warehouse with dimensions: {dimensions}")
+        return cube
+    except Exception as e:
+        logger.error(f"Error creating OLAP cube in data warehouse: {e}")
+        raise
+
+
+def write_cube(cube: pd.DataFrame, filename: str) -> None:
+    """Write the OLAP cube to a Parquet file if the filename ends in .parquet, otherwise to CSV."""
     try:
         output_path = OLAP_OUTPUT_DIR.joinpath(filename)
-        cube.to_csv(output_path, index=False)
+        if output_path.suffix == ".parquet":
+            cube.to_parquet(output_path, index=False, compression="zstd")
+        else:
+            cube.to_csv(output_path, index=False, float_format="%.4f")
         logger.info(f"OLAP cube saved to {output_path}.")
     except Exception as e:
-        logger.error(f"Error saving OLAP cube to CSV file: {e}")
+        logger.error(f"Error saving OLAP cube to {filename}: {e}")
         raise
 
 
+def cube_signature(dimensions: list, metrics: dict) -> str:
+    """
+    Fingerprint the inputs of a cube build.
+
+    The signature changes whenever the data warehouse is reloaded or the
+    dimensions or metrics change, so an unchanged signature means the cube
+    on disk is still up to date.
+    """
+    key = f"{DB_PATH.stat().st_mtime_ns}|{dimensions}|{metrics}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def cube_is_up_to_date(signature: str) -> bool:
+    """Check whether the cube files on disk were built from the same inputs."""
+    return (
+        CUBE_SIGNATURE_PATH.exists()
+        and CUBE_SIGNATURE_PATH.read_text().strip() == signature
+        and all(OLAP_OUTPUT_DIR.joinpath(filename).exists() for filename in CUBE_FILENAMES)
+    )
+
+
 def main():
     """Main function for OLAP cubing."""
     logger.info("Starting OLAP Cubing process...")
 
-    # Step 1: Ingest sales data
-    sales_df = ingest_sales_data_from_dw()
-
-    # Step 2: Define dimensions and metrics for the cube
+    # Step 1: Define dimensions and metrics for the cube
     dimensions = ["payment_type"]
     metrics = {
         "sale_amount": ["sum", "mean"],
         "sale_id": "count"
     }
 
-    # Step 3: Create the cube
-    olap_cube = create_olap_cube(sales_df, dimensions, metrics)
+    # Skip the rebuild if the warehouse and the cube definition are unchanged
+    signature = cube_signature(dimensions, metrics)
+    if cube_is_up_to_date(signature):
+        logger.info("Data warehouse unchanged since the last run, OLAP cube is up to date.")
+        logger.info(f"Please see outputs in {OLAP_OUTPUT_DIR}")
+        return
+
+    # Steps 2-3: Create the cube. Let SQLite aggregate when it can,
+    # otherwise ingest the sales data and aggregate in Polars.
+    if can_push_down(metrics):
+        olap_cube = create_olap_cube_from_dw(dimensions, metrics)
+    else:
+        columns = list(dict.fromkeys([*dimensions, *metrics, "sale_id"]))
+        sales_df = ingest_sales_data_from_dw(columns)
+        olap_cube = create_olap_cube(sales_df, dimensions, metrics)
 
-    # Step 4: Save the cube to a CSV file
-    write_cube_to_csv(olap_cube, "multidimensional_olap_cube.csv")
+    # Step 4: Save the cube as Parquet (read by the analysis scripts) and CSV
+    for filename in CUBE_FILENAMES:
+        write_cube(olap_cube, filename)
+    CUBE_SIGNATURE_PATH.write_text(signature)
 
     logger.info("OLAP Cubing process completed successfully.")
     logger.info(f"Please see outputs in {OLAP_OUTPUT_DIR}")
@@ -1,8 +1,18 @@
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+import matplotlib
+import os
 import pathlib
 import sys
 
+# Render straight to files with the non-interactive Agg backend;
+# set INTERACTIVE=1 to also show figures on screen.
+INTERACTIVE = os.environ.get("INTERACTIVE") == "1"
+if not INTERACTIVE:
+    matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+
 # For local imports, temporarily add project root to sys.path
 PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent.parent
 if str(PROJECT_ROOT) not in sys.path:
@@ -12,17 +22,28 @@ from utils.logger import logger  # noqa: E402
 
 # Constants
 OLAP_OUTPUT_DIR: pathlib.Path = pathlib.Path("data").joinpath("olap_cubing_outputs")
-CUBED_FILE: pathlib.Path = OLAP_OUTPUT_DIR.joinpath("multidimensional_olap_cube.csv")
+# The Parquet cube is a generated file; the committed CSV is used when it has not been built yet
+CUBED_PARQUET_FILE: pathlib.Path = OLAP_OUTPUT_DIR.joinpath("multidimensional_olap_cube.parquet")
+CUBED_CSV_FILE: pathlib.Path = OLAP_OUTPUT_DIR.joinpath("multidimensional_olap_cube.csv")
+CUBED_FILE: pathlib.Path = CUBED_PARQUET_FILE if CUBED_PARQUET_FILE.exists() else CUBED_CSV_FILE
 RESULTS_OUTPUT_DIR: pathlib.Path = pathlib.Path("data").joinpath("results")
 
 # Create output directory for results if it doesn't exist
 RESULTS_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def load_olap_cube(file_path: pathlib.Path) -> pd.DataFrame:
-    """Load the precomputed OLAP cube data."""
+def load_olap_cube(file_path: pathlib.Path, columns: list = None) -> pd.DataFrame:
+    """Load the precomputed OLAP cube data, optionally only the given columns."""
     try:
-        cube_df = pd.read_csv(file_path)
+        if file_path.suffix == ".parquet":
+            cube_df = pd.read_parquet(file_path, columns=columns, dtype_backend="pyarrow")
+        else:
+            cube_df = pd.read_csv(
+                file_path,
+                engine="pyarrow",
+                dtype_backend="pyarrow",
+                usecols=columns,
+            )
         logger.info(f"OLAP cube data successfully loaded from {file_path}.")
         return cube_df
     except Exception as e:
@@ -33,12 +54,22 @@ def load_olap_cube(file_path: pathlib.Path) -> pd.DataFrame:
 def analyze_sales_by_paymenttype(cube_df: pd.DataFrame) -> pd.DataFrame:
     """Aggregate total sales by payment type."""
     try:
-        # Group by payment_type and sum the sales
-        sales_by_paymenttype = (
-            cube_df.groupby("payment_type")["sale_amount_sum"].sum().reset_index()
+        # Rows without a payment type are left out, as groupby does with null keys
+        cube_df = cube_df.dropna(subset=["payment_type"])
+
+        # Sum sale_amount_sum per payment_type in one linear pass with NumPy:
+        # sort the keys, find where each key starts, and add up each run
+        payment_types = cube_df["payment_type"].to_numpy(dtype=object)
+        sale_amounts = cube_df["sale_amount_sum"].to_numpy(dtype=np.float64)
+        order = payment_types.argsort(kind="stable")
+        keys, starts = np.unique(payment_types[order], return_index=True)
+        totals = np.add.reduceat(sale_amounts[order], starts)
+
+        # Order by total sales, lowest first
+        by_total = totals.argsort(kind="stable")
+        sales_by_paymenttype = pd.DataFrame(
+            {"payment_type": keys[by_total], "TotalSales": totals[by_total]}
         )
-        sales_by_paymenttype.rename(columns={"sale_amount_sum": "TotalSales"}, inplace=True)
-        sales_by_paymenttype.sort_values(by="TotalSales", inplace=True)
         logger.info("Sales aggregated by payment_type successfully.")
         return sales_by_paymenttype
     except Exception as e:
@@ -73,7 +104,7 @@ def identify_most_used_payment_type(sales_by_paymenttype: pd.DataFrame) -> str:
 def visualize_sales_by_payment_type(sales_by_paymenttype: pd.DataFrame) -> None:
     """Visualize total sales by payment type."""
     try:
-        plt.figure(figsize=(10, 6))
+        fig = plt.figure(figsize=(10, 6))
         plt.bar(
             sales_by_paymenttype["payment_type"],
             sales_by_paymenttype["TotalSales"],
@@ -89,7 +120,9 @@ def visualize_sales_by_payment_type(sales_by_paymenttype: pd.DataFrame) -> None:
         output_path = RESULTS_OUTPUT_DIR.joinpath("sales_by_payment_type.png")
         plt.savefig(output_path)
         logger.info(f"Visualization saved to {output_path}.")
-        plt.show()
+        if INTERACTIVE:
+            plt.show()
+        plt.close(fig)
     except Exception as e:
         logger.error(f"Error visualizing sales by payment type: {e}")
         raise
@@ -99,8 +132,8 @@ def main():
     """Main function for analyzing and visualizing sales data."""
     logger.info("Starting SALES_BY_PAYMENT_TYPE analysis...")
 
-    # Step 1: Load the precomputed OLAP cube
-    cube_df = load_olap_cube(CUBED_FILE)
+    # Step 1: Load the precomputed OLAP cube (sale_ids is not needed for this analysis)
+    cube_df = load_olap_cube(CUBED_FILE, columns=["payment_type", "sale_amount_sum"])
 
     # Step 2: Analyze total sales by payment type
     sales_by_paymenttype = analyze_sales_by_paymenttype(cube_df)
@@ -108,12 +141,10 @@ def main():
     # Step 3: Identify the highest revenue by payment type
     least_used_payment_type = identify_least_used_payment_type(sales_by_paymenttype)
     logger.info(f"Least revenue by payment type: {least_used_payment_type}")
-    logger.info("Close the Figure to complete this script.")
 
     # Step 4: Identify the most revenue by payment type
     most_used_payment_type = identify_most_used_payment_type(sales_by_paymenttype)
     logger.info(f"Most revenue by payment type: {most_used_payment_type}")
-    logger.info("Close the Figure to complete this script.")
 
     # Step 5: Visualize total sales by payment type
     visualize_sales_by_payment_type(sales_by_paymenttype)
@@ -1,4 +1,7 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import os
 import sqlite3
 import pathlib
 import sys
@@ -15,8 +18,11 @@ from utils.logger import logger
 DW_DIR = pathlib.Path("data").joinpath("dw")
 DW_DIR.mkdir(parents=True, exist_ok=True)  # Needed to add this line to ensure the data warehouse directory exists
 DB_PATH = DW_DIR.joinpath("smart_sales.db")
+SALE_PARQUET_PATH = DW_DIR.joinpath("sale.parquet")  # Columnar snapshot of the sale table for the OLAP Polars fallback
+SALE_PARQUET_TMP_PATH = DW_DIR.joinpath("sale.parquet.tmp")  # Snapshot being written, renamed once the load commits
 PREPARED_DATA_DIR = pathlib.Path("data").joinpath("prepared")
 PREPARED_DATA_DIR.mkdir(parents=True, exist_ok=True)
+CSV_CHUNK_SIZE = 100_000  # Rows read from each prepared CSV at a time, bounding memory use
 
 def create_schema(cursor: sqlite3.Cursor) -> None:
     """Create tables in the data warehouse if they don't exist."""
@@ -44,37 +50,67 @@ def create_schema(cursor: sqlite3.Cursor) -> None:
     
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS sale (
-            sale_id REAL PRIMARY KEY,
+            sale_id INTEGER PRIMARY KEY,
             customer_id INTEGER,
             product_id INTEGER,
-            store_id REAL,
-            campaign_id REAL,
+            store_id INTEGER,
+            campaign_id INTEGER,
             sale_amount REAL,
             sale_date TEXT,
             tax_amount REAL,
             payment_type TEXT,
+            sale_year INTEGER,
             FOREIGN KEY (customer_id) REFERENCES customer (customer_id),
             FOREIGN KEY (product_id) REFERENCES product (product_id)
         )
     """)
 
+    # Index the OLAP cube dimensions so GROUP BY payment_type / sale_year can use them
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sale_payment_type ON sale (payment_type)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sale_year ON sale (sale_year)")
+
 def delete_existing_records(cursor: sqlite3.Cursor) -> None:
-    """Delete all existing records from the customer, product, and sale table."""
-    cursor.execute("DELETE FROM customer")
-    cursor.execute("DELETE FROM product")
-    cursor.execute("DELETE FROM sale")
+    """
+    Delete all existing records by dropping the sale, product, and customer tables.
+    Dropping frees the pages without scanning every row; create_schema recreates the tables.
+    """
+    # Separate execute calls (not executescript, which would COMMIT the open transaction)
+    cursor.execute("DROP TABLE IF EXISTS sale")
+    cursor.execute("DROP TABLE IF EXISTS product")
+    cursor.execute("DROP TABLE IF EXISTS customer")
+
+def insert_dataframe(df: pd.DataFrame, table: str, cursor: sqlite3.Cursor) -> None:
+    """Insert all rows of a DataFrame into a table with a single executemany call."""
+    columns = ", ".join(df.columns)
+    placeholders = ", ".join("?" * len(df.columns))
+    # sqlite3 only binds plain Python values: convert numpy scalars and pd.NA to int/float/str/None
+    rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    cursor.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", rows)
 
 def insert_customers(customers_df: pd.DataFrame, cursor: sqlite3.Cursor) -> None:
     """Insert customer data into the customer table."""
-    customers_df.to_sql("customer", cursor.connection, if_exists="append", index=False)
+    insert_dataframe(customers_df, "customer", cursor)
 
 def insert_products(products_df: pd.DataFrame, cursor: sqlite3.Cursor) -> None:
     """Insert product data into the product table."""
-    products_df.to_sql("product", cursor.connection, if_exists="append", index=False)
+    insert_dataframe(products_df, "product", cursor)
 
 def insert_sales(sales_df: pd.DataFrame, cursor: sqlite3.Cursor) -> None:
     """Insert sales data into the sale table."""
-    sales_df.to_sql("sale", cursor.connection, if_exists="append", index=False)
+    insert_dataframe(sales_df, "sale", cursor)
+
+def read_prepared_csv(file_name: str, dtype: dict):
+    """
+    Read a prepared CSV in chunks of CSV_CHUNK_SIZE rows.
+    The PyArrow engine cannot read in chunks, so this uses the C engine
+    with explicit dtypes (no type inference) and Arrow-backed columns.
+    """
+    return pd.read_csv(
+        PREPARED_DATA_DIR.joinpath(file_name),
+        chunksize=CSV_CHUNK_SIZE,
+        dtype_backend="pyarrow",
+        dtype=dtype,
+    )
 
 def load_data_to_db() -> None:
     try:
@@ -83,64 +119,115 @@ def load_data_to_db() -> None:
         cursor = conn.cursor()
         logger.info(f"Connected to SQLite database at {DB_PATH}")
 
+        # Bulk-load settings: the warehouse is rebuilt from the prepared CSVs,
+        # so skip fsync on every write and keep temporary tables in memory
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.execute("PRAGMA temp_store=MEMORY")
 
-        # Create schema and clear existing records
-        create_schema(cursor)
+        # Run the whole reload as one transaction, committed once at the end
+        cursor.execute("BEGIN")
+
+        # Clear existing records and recreate the schema
         delete_existing_records(cursor)
-        logger.info("Schema created and existing records deleted.")
-
-        # Load prepared data using pandas
-        customers_df = pd.read_csv(PREPARED_DATA_DIR.joinpath("customers_prepared.csv"))
-        customers_df = customers_df.rename(columns={
-            "CustomerID": "customer_id",
-            "Name": "name",
-            "Region": "region",
-            "JoinDate": "join_date",
-            "RewardsPoints": "rewards_points",
-            "MemberTier": "member_tier"
-        })
-        
-        products_df = pd.read_csv(PREPARED_DATA_DIR.joinpath("products_prepared.csv"))
-        products_df = products_df.rename(columns={
-            "productid": "product_id",
-            "productname": "product_name",
-            "category": "category",
-            "unitprice": "unit_price",
-            "productsku": "product_sku",
-            "condition": "condition"
-        })
-        
-        sales_df = pd.read_csv(PREPARED_DATA_DIR.joinpath("sales_prepared.csv"))
-        sales_df['CustomerID'] = sales_df['CustomerID'].astype('Int64') # Use 'Int64' for matching datatype in SQLite
-        sales_df['ProductID'] = sales_df['ProductID'].astype('Int64')
-        sales_df = sales_df.rename(columns={
-            "TransactionID": "sale_id",
-            "SaleDate": "sale_date",
-            "CustomerID": "customer_id",
-            "ProductID": "product_id",
-            "StoreID": "store_id",
-            "CampaignID": "campaign_id",
-            "SaleAmount": "sale_amount",
-            "TaxAmount": "tax_amount",
-            "PaymentType": "payment_type"
-        })
-        print("sales_df columns:", sales_df.dtypes)
-
-        #Delete Exisiting Records first
-        #delete_existing_records(cursor)
-        #logger.info("Existing records deleted from all tables.")
-
-        # Insert data into the database
-        insert_customers(customers_df, cursor)
-        logger.info(f"Inserted {len(customers_df)} records into customer table.")
-        
-        insert_products(products_df, cursor)
-        logger.info(f"Inserted {len(products_df)} records into product table.")
-        
-        insert_sales(sales_df, cursor)
-        logger.info(f"Inserted {len(sales_df)} records into sale table.")
+        create_schema(cursor)
+        logger.info("Existing records deleted and schema created.")
+
+        # Stream each prepared CSV into its table chunk by chunk,
+        # so memory stays bounded by CSV_CHUNK_SIZE rows rather than the file size
+        customer_count = 0
+        for customers_df in read_prepared_csv(
+            "customers_prepared.csv",
+            dtype={"CustomerID": "Int32", "RewardsPoints": "float64"},
+        ):
+            customers_df = customers_df.rename(columns={
+                "CustomerID": "customer_id",
+                "Name": "name",
+                "Region": "region",
+                "JoinDate": "join_date",
+                "RewardsPoints": "rewards_points",
+                "MemberTier": "member_tier"
+            })
+            insert_customers(customers_df, cursor)
+            customer_count += len(customers_df)
+        logger.info(f"Inserted {customer_count} records into customer table.")
+
+        product_count = 0
+        for products_df in read_prepared_csv(
+            "products_prepared.csv",
+            dtype={"productid": "Int32", "unitprice": "float64", "productsku": "Int32"},
+        ):
+            products_df = products_df.rename(columns={
+                "productid": "product_id",
+                "productname": "product_name",
+                "category": "category",
+                "unitprice": "unit_price",
+                "productsku": "product_sku",
+                "condition": "condition"
+            })
+            insert_products(products_df, cursor)
+            product_count += len(products_df)
+        logger.info(f"Inserted {product_count} records into product table.")
+
+        sale_count = 0
+        parquet_writer = None
+        try:
+            for sales_df in read_prepared_csv(
+                "sales_prepared.csv",
+                dtype={
+                    # Every column is typed up front so all chunks share one Parquet schema
+                    "TransactionID": "Int32",  # Nullable integers to match the INTEGER columns in SQLite
+                    "SaleDate": "string[pyarrow]",
+                    "CustomerID": "Int32",
+                    "ProductID": "Int32",
+                    "StoreID": "Int32",
+                    "CampaignID": "Int32",
+                    "SaleAmount": "float64",
+                    "TaxAmount": "float64",
+                    "PaymentType": "category",
+                },
+            ):
+                sales_df = sales_df.rename(columns={
+                    "TransactionID": "sale_id",
+                    "SaleDate": "sale_date",
+                    "CustomerID": "customer_id",
+                    "ProductID": "product_id",
+                    "StoreID": "store_id",
+                    "CampaignID": "campaign_id",
+                    "SaleAmount": "sale_amount",
+                    "TaxAmount": "tax_amount",
+                    "PaymentType": "payment_type"
+                })
+                # SaleDate is M/D/YYYY: slice the year once here so it can be grouped as an integer
+                sales_df["sale_year"] = sales_df["sale_date"].str[-4:].astype("int16")
+
+                # Columnar snapshot of the fact table. olap_cubing.py reads it only for cube
+                # metrics that SQLite cannot aggregate (its Polars fallback path).
+                sales_table = pa.Table.from_pandas(sales_df, preserve_index=False)
+                if parquet_writer is None:
+                    parquet_writer = pq.ParquetWriter(SALE_PARQUET_TMP_PATH, sales_table.schema, compression="zstd")
+                # Cast to the file schema, which also drops per-chunk pandas metadata
+                parquet_writer.write_table(sales_table.cast(parquet_writer.schema))
+
+                insert_sales(sales_df, cursor)
+                sale_count += len(sales_df)
+        finally:
+            if parquet_writer is not None:
+                parquet_writer.close()
+        logger.info(f"Inserted {sale_count} records into sale table.")
 
         conn.commit()
+
+        # Publish the snapshot only now that the warehouse load has committed, so a failed
+        # load never leaves a partial sale.parquet that no longer matches the database
+        if parquet_writer is not None:
+            os.replace(SALE_PARQUET_TMP_PATH, SALE_PARQUET_PATH)
+            logger.info(f"Sale table snapshot written to {SALE_PARQUET_PATH}")
+        else:
+            SALE_PARQUET_PATH.unlink(missing_ok=True)
+    except Exception:
+        SALE_PARQUET_TMP_PATH.unlink(missing_ok=True)
+        raise
     finally:
         if conn:
             conn.close()
@@ -1,9 +1,18 @@
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
+import matplotlib
+import os
 import pathlib
 import sys
 
+# Render straight to files with the non-interactive Agg backend;
+# set INTERACTIVE=1 to also show figures on screen.
+INTERACTIVE = os.environ.get("INTERACTIVE") == "1"
+if not INTERACTIVE:
+    matplotlib.use("Agg")
+
+import seaborn as sns  # noqa: E402
+import matplotlib.pyplot as plt  # noqa: E402
+
 # For local imports, temporarily add project root to sys.path
 PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent.parent
 if str(PROJECT_ROOT) not in sys.path:
@@ -16,34 +25,85 @@ DATA_DIR: pathlib.Path = pathlib.Path("data")
 PREPARED_DATA_DIR: pathlib.Path = DATA_DIR / "prepared"
 CUSTOM_OUTPUT_DIR: pathlib.Path = pathlib.Path("data").joinpath("custom_outputs")
 RESULTS_OUTPUT_DIR: pathlib.Path = pathlib.Path("data").joinpath("custom_project_results")
+SALES_WITH_CATEGORY_PATH: pathlib.Path = PREPARED_DATA_DIR.joinpath("sales_with_category.parquet")  # Cached sales + ProductCategory join
 
 # Create output directory for results if it doesn't exist
 CUSTOM_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 RESULTS_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 # Load data
-def load_data(file_name: str) -> pd.DataFrame:
-    """Load prepared sales data from CSV."""
+def load_data(file_name: str, columns: list = None, dtype: dict = None) -> pd.DataFrame:
+    """Load prepared sales data from CSV, optionally only the given columns."""
     try:
         file_path = PREPARED_DATA_DIR.joinpath(file_name)
-        df = pd.read_csv(file_path)
+        df = pd.read_csv(
+            file_path,
+            engine="pyarrow",
+            dtype_backend="pyarrow",
+            usecols=columns,
+            dtype=dtype,
+        )
         logger.info(f"Data successfully loaded from {file_path}.")
         return df
     except Exception as e:
         logger.error(f"Error loading data: {e}")
         raise
 
+# Load sales data joined with product category
+def load_sales_with_category() -> pd.DataFrame:
+    """
+    Load sales data with the ProductCategory of each sale.
+    The join is cached as Parquet and reused until either prepared CSV changes.
+    """
+    sources = [
+        PREPARED_DATA_DIR.joinpath("sales_prepared.csv"),
+        PREPARED_DATA_DIR.joinpath("products_prepared.csv"),
+    ]
+    if SALES_WITH_CATEGORY_PATH.exists() and SALES_WITH_CATEGORY_PATH.stat().st_mtime > max(
+        source.stat().st_mtime for source in sources
+    ):
+        sales_df = pd.read_parquet(SALES_WITH_CATEGORY_PATH)
+        logger.info(f"Sales data with product category loaded from cache {SALES_WITH_CATEGORY_PATH}.")
+        return sales_df
+
+    sales_df = load_data(
+        "sales_prepared.csv",
+        columns=["SaleDate", "ProductID", "SaleAmount"],
+        dtype={"ProductID": "Int32", "SaleAmount": "float64"},
+    )
+    logger.info(f"Sales data loaded with shape: {sales_df.shape}")
+
+    product_df = load_data(
+        "products_prepared.csv",
+        columns=["productid", "category"],
+        dtype={"productid": "Int32"},
+    )
+    logger.info(f"Product data loaded with shape: {product_df.shape}")
+
+    # Rename columns for clarity and join the product category onto the sales data.
+    # Products are indexed by their unique ProductID, so join() looks each sale up directly.
+    product_df = product_df.rename(columns={'category': 'ProductCategory', 'productid': 'ProductID'})
+    sales_df = sales_df.join(product_df.set_index('ProductID')['ProductCategory'], on='ProductID')
+    # A handful of categories: group on integer category codes instead of hashing strings
+    sales_df['ProductCategory'] = sales_df['ProductCategory'].astype('category')
+    logger.info(f"Sales data merged with product data. New shape: {sales_df.shape}")
+
+    sales_df.to_parquet(SALES_WITH_CATEGORY_PATH, index=False)
+    logger.info(f"Sales data with product category cached to {SALES_WITH_CATEGORY_PATH}.")
+    return sales_df
+
 # Aggregate data
 def aggregate_data(df: pd.DataFrame) -> pd.DataFrame:
     """Aggregate sales data by product category and Year."""
     logger.info("Aggregating sales data by product category and Year...")
     logger.info(f"Data shape before aggregation: {df.shape}")
-    df['Year'] = pd.to_datetime(df['SaleDate']).dt.to_period('Y')  # Convert sale_date to Year
+    df['Year'] = df['SaleDate'].str[-4:].astype('int16')  # SaleDate is M/D/YYYY, so the year is the last 4 characters
     df['SaleAmount'] = df['SaleAmount'].astype(float).round(2)  # Ensure sale_amount is float
-    df['ProductCategory'] = df['ProductCategory'].astype(str)  # Ensure product_category is string
+    df['ProductCategory'] = df['ProductCategory'].astype('category')  # Ensure product_category is categorical
     logger.info(f"Data shape after aggregation: {df.shape}")
     # Group by product_category and Year, summing the sale_amount
-    df = df.groupby(['ProductCategory', 'Year'])['SaleAmount'].sum().reset_index()
+    # observed=True: only category/year pairs that occur, no Cartesian product of categories
+    df = df.groupby(['ProductCategory', 'Year'], observed=True)['SaleAmount'].sum().reset_index()
     return df
 
 # Save Aggregated Data
@@ -64,7 +124,7 @@ def visualize_sales_by_product_category_and_year(df: pd.DataFrame) -> None:
     logger.info("Creating visualization for sales amount by product category and Year...")
     try:
         sns.set_theme(style="whitegrid")
-        plt.figure(figsize=(12, 6))
+        fig = plt.figure(figsize=(12, 6))
         sns.barplot(data=df, x='ProductCategory', y='SaleAmount', hue='Year')
         plt.title('Sales Amount by Product Category and Year')
         plt.xlabel('Product Category')
@@ -76,7 +136,9 @@ def visualize_sales_by_product_category_and_year(df: pd.DataFrame) -> None:
         output_path = RESULTS_OUTPUT_DIR.joinpath("sales_by_product_category_and_year.png")
         plt.savefig(output_path)
         logger.info(f"Visualization saved to {output_path}.")
-        plt.show()
+        if INTERACTIVE:
+            plt.show()
+        plt.close(fig)
         logger.info("Visualization created successfully.")
     except Exception as e:
         logger.error(f"Error creating visualization: {e}")
@@ -87,19 +149,15 @@ def visualize_top_category_per_year(df: pd.DataFrame) -> None:
     logger.info("Creating visualization for top category per year...")
     try:
         # Group by Year and ProductCategory, then sum sales
-        grouped = df.groupby(['Year', 'ProductCategory'])['SaleAmount'].sum().reset_index()
+        grouped = df.groupby(['Year', 'ProductCategory'], observed=True)['SaleAmount'].sum().reset_index()
 
-        # Get top category per year
-        top_category_per_year = (
-            grouped.sort_values(['Year', 'SaleAmount'], ascending=[True, False])
-                   .groupby('Year')
-                   .head(1)
-        )
+        # Get top category per year: the row with the highest sales in each year (no full sort needed)
+        top_category_per_year = grouped.loc[grouped.groupby('Year')['SaleAmount'].idxmax()].reset_index(drop=True)
         logger.info("Top categories per year:")
         logger.info(top_category_per_year)
         # Plot
         sns.set_theme(style="whitegrid")
-        plt.figure(figsize=(10, 6))
+        fig = plt.figure(figsize=(10, 6))
         ax = sns.barplot(
             data=top_category_per_year,
             x='Year',
@@ -115,7 +173,9 @@ def visualize_top_category_per_year(df: pd.DataFrame) -> None:
         output_path = RESULTS_OUTPUT_DIR.joinpath("top_category_per_year.png")
         plt.savefig(output_path)
         logger.info(f"Top category per year visualization saved to {output_path}.")
-        plt.show()
+        if INTERACTIVE:
+            plt.show()
+        plt.close(fig)
     except Exception as e:
         logger.error(f"Error creating top category per year visualization: {e}")
         raise
@@ -124,18 +184,8 @@ def main():
     """Main function for analyzing and visualizing sales data."""
     logger.info("Starting SALES_BY_PRODUCT_CATEGORY_AND_YEAR analysis...")
 
-    # Step 1: Load sales data
-    sales_df = load_data("sales_prepared.csv")
-    logger.info(f"Sales data loaded with shape: {sales_df.shape}")
-
-    # Step 2: Load product data and merge with sales data
-    product_df = load_data("products_prepared.csv")
-    logger.info(f"Product data loaded with shape: {product_df.shape}")
-    
-    #Step 3: Rename columns for clarity and merged product data with sales data
-    product_df = product_df.rename(columns={'category': 'ProductCategory', 'productid': 'ProductID'})    
-    sales_df = sales_df.merge(product_df[['ProductID', 'ProductCategory']], on='ProductID', how='left')
-    logger.info(f"Sales data merged with product data. New shape: {sales_df.shape}")
+    # Steps 1-3: Load sales data merged with product category (cached after the first run)
+    sales_df = load_sales_with_category()
 
     # Step 4: Aggregate data
     df = aggregate_data(sales_df)
@@ -21,8 +21,16 @@ import pathlib
 import sys
 
 # Import from external packages (requires a virtual environment)
+import numpy as np
 import pandas as pd
 
+# pyarrow is optional: without it pandas' own CSV reader and writer are used
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
 # Ensure project root is in sys.path for local imports (now 3 parents are needed)
 sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent.parent))
 
@@ -75,7 +83,11 @@ def save_prepared_data(df: pd.DataFrame, file_name: str) -> None:
     """
     logger.info(f"FUNCTION START: save_prepared_data with file_name={file_name}, dataframe shape={df.shape}")
     file_path = PREPARED_DATA_DIR.joinpath(file_name)
-    df.to_csv(file_path, index=False)
+    if pa is not None:
+        # pyarrow's C++ CSV writer is much faster than the pandas writer
+        pa_csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), file_path)
+    else:
+        df.to_csv(file_path, index=False)
     logger.info(f"Data saved to {file_path}")
 
 
@@ -126,9 +138,8 @@ def handle_missing_values(df: pd.DataFrame) -> pd.DataFrame:
     logger.info(f"Total missing values before handling: {missing_before}")
     
     # Example:
-    df['Name'].fillna('Unknown', inplace=True)
     df.dropna(subset=['CustomerID'], inplace=True)
-    df['RewardsPoints'].fillna(df['RewardsPoints'].mean(), inplace=True) 
+    df = df.fillna({'Name': 'Unknown', 'RewardsPoints': df['RewardsPoints'].mean()})
 
     def assign_member_tier(RewardsPoints: float) -> str:
         """
@@ -211,13 +222,17 @@ def main() -> None:
     logger.info(f"Initial dataframe shape: {df.shape}")
     
     # Clean column names
-    original_columns = df.columns.tolist()
-    df.columns = df.columns.str.strip()
+    original_columns = df.columns.to_numpy()
+    df = df.rename(columns=str.strip)
     
     # Log if any column names changed
-    changed_columns = [f"{old} -> {new}" for old, new in zip(original_columns, df.columns) if old != new]
-    if changed_columns:
-        logger.info(f"Cleaned column names: {', '.join(changed_columns)}")
+    # Positions are found with one NumPy comparison; the message is only built if INFO is logged
+    changed = np.flatnonzero(original_columns != df.columns.to_numpy())
+    if changed.size:
+        logger.opt(lazy=True).info(
+            "Cleaned column names: {}",
+            lambda: ', '.join(f"{original_columns[i]} -> {df.columns[i]}" for i in changed),
+        )
 
     # Remove duplicates
     df = remove_duplicates(df)
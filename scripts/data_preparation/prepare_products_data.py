@@ -21,8 +21,16 @@ import pathlib
 import sys
 
 # Import from external packages (requires a virtual environment)
+import numpy as np
 import pandas as pd
 
+# pyarrow is optional: without it pandas' own CSV reader and writer are used
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
 # Ensure project root is in sys.path for local imports (now 3 parents are needed)
 sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent.parent))
 
@@ -41,6 +49,9 @@ DATA_DIR: pathlib.Path = PROJECT_ROOT/ "data"
 RAW_DATA_DIR: pathlib.Path = DATA_DIR / "raw"  
 PREPARED_DATA_DIR: pathlib.Path = DATA_DIR / "prepared"  # place to store prepared data
 
+# Low-cardinality text columns, stored as categoricals
+CATEGORICAL_COLUMNS: list = ["category", "condition"]
+
 
 # Ensure the directories exist or create them
 DATA_DIR.mkdir(exist_ok=True)
@@ -64,14 +75,35 @@ def read_raw_data(file_name: str) -> pd.DataFrame:
     logger.info(f"FUNCTION START: read_raw_data with file_name={file_name}")
     file_path = RAW_DATA_DIR.joinpath(file_name)
     logger.info(f"Reading data from {file_path}")
-    df = pd.read_csv(file_path)
+    try:
+        # The pyarrow engine parses the file multi-threaded
+        df = pd.read_csv(file_path, engine="pyarrow")
+    except ImportError:
+        logger.info("pyarrow is not installed, reading with the C engine")
+        df = pd.read_csv(file_path, low_memory=False)
     logger.info(f"Loaded dataframe with {len(df)} rows and {len(df.columns)} columns")
     
-    logger.info(f"Column datatypes: \n{df.dtypes}")
-    logger.info(f"Number of unique values: \n{df.nunique()}")
+    # nunique() hashes every column, so the profile is only computed when DEBUG logging is on
+    logger.opt(lazy=True).debug("Column datatypes: \n{}", lambda: df.dtypes)
+    logger.opt(lazy=True).debug("Number of unique values: \n{}", lambda: df.nunique())
     
     return df
 
+def fill_category(series: pd.Series, value: str) -> pd.Series:
+    """
+    Fill missing values of a categorical column, adding the fill value as a category if needed.
+
+    Args:
+        series (pd.Series): Categorical column.
+        value (str): Value to put in place of missing entries.
+    
+    Returns:
+        pd.Series: Column with missing values filled.
+    """
+    if value not in series.cat.categories:
+        series = series.cat.add_categories([value])
+    return series.fillna(value)
+
 def save_prepared_data(df: pd.DataFrame, file_name: str) -> None:
     """
     Save cleaned data to CSV.
@@ -82,7 +114,11 @@ def save_prepared_data(df: pd.DataFrame, file_name: str) -> None:
     """
     logger.info(f"FUNCTION START: save_prepared_data with file_name={file_name}, dataframe shape={df.shape}")
     file_path = PREPARED_DATA_DIR.joinpath(file_name)
-    df.to_csv(file_path, index=False)
+    if pa is not None:
+        # pyarrow's C++ CSV writer is much faster than the pandas writer
+        pa_csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), file_path)
+    else:
+        df.to_csv(file_path, index=False)
     logger.info(f"Data saved to {file_path}")
 
 def remove_duplicates(df: pd.DataFrame) -> pd.DataFrame:
@@ -98,11 +134,8 @@ def remove_duplicates(df: pd.DataFrame) -> pd.DataFrame:
     logger.info(f"FUNCTION START: remove_duplicates with dataframe shape={df.shape}")
     initial_count = len(df)
     
-    # TODO: Consider which columns should be used to identify duplicates
-    # Example: For products, SKU or product code is typically unique
-    # So we could do something like this:
-    # df = df.drop_duplicates(subset=['product_code'])
-    df = df.drop_duplicates()
+    # productid is the natural key, so only that column is hashed rather than every field of the row
+    df = df.drop_duplicates(subset=['productid'], keep='first')
     
     removed_count = initial_count - len(df)
     logger.info(f"Removed {removed_count} duplicate rows")
@@ -124,55 +157,61 @@ def handle_missing_values(df: pd.DataFrame) -> pd.DataFrame:
     
     # Log missing values by column before handling
     # NA means missing or "not a number" - ask your AI for details
-    missing_by_col = df.isna().sum()
-    logger.info(f"Missing values by column before handling:\n{missing_by_col}")
+    logger.opt(lazy=True).debug("Missing values by column before handling:\n{}", lambda: df.isna().sum())
     
     # For example: Different strategies may be needed for different columns
     # USE YOUR COLUMN NAMES - these are just examples
-    df['productname'].fillna('Unknown Product', inplace=True)
-    df['category'].fillna('', inplace=True)
-    df['productsku'].fillna(df['unitprice'].median(), inplace=True)
-    df['condition'].fillna('Unknown', inplace=True)  
+    df = df.fillna({
+        'productname': 'Unknown Product',
+        'productsku': df['unitprice'].median(),
+    })
+    df['category'] = fill_category(df['category'], '')
+    df['condition'] = fill_category(df['condition'], 'Unknown')
     df.dropna(subset=['productid'], inplace=True)  # Remove rows without product code
     
     # Log missing values by column after handling
-    missing_after = df.isna().sum()
-    logger.info(f"Missing values by column after handling:\n{missing_after}")
+    logger.opt(lazy=True).debug("Missing values by column after handling:\n{}", lambda: df.isna().sum())
     logger.info(f"{len(df)} records remaining after handling missing values.")
     return df
 
-def remove_outliers(df: pd.DataFrame) -> pd.DataFrame:
+def outlier_mask(df: pd.DataFrame) -> np.ndarray:
     """
-    Remove outliers based on thresholds.
+    Flag the rows that are not outliers based on thresholds.
     This logic is very specific to the actual data and business rules.
 
     Args:
         df (pd.DataFrame): Input DataFrame.
     
     Returns:
-        pd.DataFrame: DataFrame with outliers removed.
+        np.ndarray: Boolean mask, True for rows to keep.
     """
-    logger.info(f"FUNCTION START: remove_outliers with dataframe shape={df.shape}")
-    initial_count = len(df)
+    logger.info(f"FUNCTION START: outlier_mask with dataframe shape={df.shape}")
     
     # Recommended - just use ranges based on reasonable data
     # People should not be 22 feet tall, etc. 
     # OPTIONAL ADVANCED: Use IQR method to identify outliers in numeric columns
     # Example:
-    for col in ['unitprice', 'productsku']:
-        if col in df.columns and df[col].dtype in ['int64', 'float64']:
-            Q1 = df[col].quantile(0.25)
-            Q3 = df[col].quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
-            df = df[(df[col] >= lower_bound) & (df[col] <= upper_bound)]
-            logger.info(f"Applied outlier removal to {col}: bounds [{lower_bound}, {upper_bound}]")
+    # Quartiles of all columns come from one np.nanquantile call, and the bounds
+    # are combined into one mask
+    numeric_cols = [
+        col for col in ['unitprice', 'productsku']
+        if col in df.columns and df[col].dtype in ['int64', 'float64']
+    ]
+    if not numeric_cols:
+        logger.info("No numeric columns to check for outliers")
+        return np.ones(len(df), dtype=bool)
+
+    values = df[numeric_cols].to_numpy(dtype=np.float64)
+    Q1, Q3 = np.nanquantile(values, [0.25, 0.75], axis=0)
+    IQR = Q3 - Q1
+    lower_bounds = Q1 - 1.5 * IQR
+    upper_bounds = Q3 + 1.5 * IQR
+    keep = ((values >= lower_bounds) & (values <= upper_bounds)).all(axis=1)
+    for col, lower_bound, upper_bound in zip(numeric_cols, lower_bounds, upper_bounds):
+        logger.info(f"Applied outlier bounds to {col}: [{lower_bound}, {upper_bound}]")
     
-    removed_count = initial_count - len(df)
-    logger.info(f"Removed {removed_count} outlier rows")
-    logger.info(f"{len(df)} records remaining after removing outliers.")
-    return df
+    logger.info(f"Found {(~keep).sum()} outlier rows")
+    return keep
 
 def standardize_formats(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -189,31 +228,36 @@ def standardize_formats(df: pd.DataFrame) -> pd.DataFrame:
     # Suggestion: Consider standardizing text fields, units, and categorical variables
     # Examples (update based on your column names and types):
     df['productname'] = df['productname'].str.title()  # Title case for product names
-    df['category'] = df['category'].str.lower()  # Lowercase for categories
-    df['unitprice'] = df['unitprice'].round(2)  # Round prices to 2 decimal places
+    # category is categorical, so map() lower-cases the few category labels rather than every row
+    df['category'] = df['category'].map(str.lower, na_action='ignore')  # Lowercase for categories
+    # Round prices to 2 decimal places in a single NumPy buffer. The column's own array
+    # is read-only under copy-on-write, so round one copy in place and assign it back.
+    unitprice = df['unitprice'].to_numpy(dtype=np.float64, copy=True)
+    np.round(unitprice, 2, out=unitprice)
+    df['unitprice'] = unitprice
     
     logger.info("Completed standardizing formats")
     return df
 
-def validate_data(df: pd.DataFrame) -> pd.DataFrame:
+def validation_mask(df: pd.DataFrame) -> np.ndarray:
     """
-    Validate data against business rules.
+    Flag the rows that pass the business rules.
 
     Args:
         df (pd.DataFrame): Input DataFrame.
     
     Returns:
-        pd.DataFrame: Validated DataFrame.
+        np.ndarray: Boolean mask, True for rows to keep.
     """
-    logger.info(f"FUNCTION START: validate_data with dataframe shape={df.shape}")
+    logger.info(f"FUNCTION START: validation_mask with dataframe shape={df.shape}")
     
     # Suggestion: Check for valid values in critical fields
-    invalid_sku = df[df['productsku'] > 99999].shape[0]
+    invalid_sku = (df['productsku'] > 99999).sum()
     logger.info(f"Found {invalid_sku} products with out of range sku")
-    df = df[df['unitprice'] > 0]
+    keep = (df['unitprice'] > 0).to_numpy()
     
-    logger.info("Data validation complete")
-    return df
+    logger.info(f"Found {(~keep).sum()} products without a positive unit price")
+    return keep
 
 def main() -> None:
     """
@@ -234,9 +278,6 @@ def main() -> None:
     # Read raw data
     df = read_raw_data(input_file)
 
-        # Read raw data
-    df = read_raw_data(input_file)
-
     # Record original shape
     original_shape = df.shape
 
@@ -245,13 +286,24 @@ def main() -> None:
     logger.info(f"Initial dataframe shape: {df.shape}")
     
     # Clean column names
-    original_columns = df.columns.tolist()
-    df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_')
+    original_columns = df.columns.to_numpy()
+    df = df.rename(columns=lambda col: col.strip().lower().replace(' ', '_'))
     
     # Log if any column names changed
-    changed_columns = [f"{old} -> {new}" for old, new in zip(original_columns, df.columns) if old != new]
-    if changed_columns:
-        logger.info(f"Cleaned column names: {', '.join(changed_columns)}")
+    # Positions are found with one NumPy comparison; the message is only built if INFO is logged
+    changed = np.flatnonzero(original_columns != df.columns.to_numpy())
+    if changed.size:
+        logger.opt(lazy=True).info(
+            "Cleaned column names: {}",
+            lambda: ', '.join(f"{original_columns[i]} -> {df.columns[i]}" for i in changed),
+        )
+
+    # Store low-cardinality text columns as categoricals
+    df = df.astype({col: 'category' for col in CATEGORICAL_COLUMNS})
+
+    # Downcast the integer key to the smallest unsigned width. unitprice and productsku
+    # stay float64: prices keep full precision and productsku has gaps.
+    df['productid'] = pd.to_numeric(df['productid'], downcast='unsigned')
 
     # Remove duplicates
     df = remove_duplicates(df)
@@ -259,9 +311,10 @@ def main() -> None:
     # Handle missing values
     df = handle_missing_values(df)
 
-    df = remove_outliers(df)
-
-    df = validate_data(df)
+    # Drop outliers and rows that fail validation with one combined mask, slicing the frame once
+    initial_count = len(df)
+    df = df[outlier_mask(df) & validation_mask(df)]
+    logger.info(f"Removed {initial_count - len(df)} outlier or invalid rows, {len(df)} records remaining")
 
     df = standardize_formats(df)
 
@@ -24,6 +24,13 @@ import numpy as np
 # Import from external packages (requires a virtual environment)
 import pandas as pd
 
+# pyarrow is optional: without it pandas' own CSV reader and writer are used
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
 # Ensure project root is in sys.path for local imports (now 3 parents are needed)
 sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent.parent))
 
@@ -42,6 +49,23 @@ DATA_DIR: pathlib.Path = PROJECT_ROOT/ "data"
 RAW_DATA_DIR: pathlib.Path = DATA_DIR / "raw"  
 PREPARED_DATA_DIR: pathlib.Path = DATA_DIR / "prepared"  # place to store prepared data
 
+# Column types of the raw sales file, so the CSV parser does not have to infer them.
+# The ID columns have gaps, so they are read as nullable 32-bit integers (the width of the
+# warehouse keys); "?" marks an unknown sale amount.
+RAW_DTYPES: dict = {
+    "TransactionID": "Int32",
+    "CustomerID": "Int32",
+    "ProductID": "Int32",
+    "StoreID": "Int32",
+    "CampaignID": "Int32",
+    "SaleAmount": "float64",
+    "TaxAmount": "float64",
+}
+RAW_NA_VALUES: list = ["?"]
+
+# Low-cardinality text columns, stored as categoricals
+CATEGORICAL_COLUMNS: list = ["PaymentType"]
+
 
 # Ensure the directories exist or create them
 DATA_DIR.mkdir(exist_ok=True)
@@ -66,18 +90,39 @@ def read_raw_data(file_name: str) -> pd.DataFrame:
     """
     logger.info(f"FUNCTION START: read_raw_data with file_name={file_name}")
     filepath = RAW_DATA_DIR.joinpath(file_name)
-    df = pd.read_csv(filepath)
+    try:
+        # The pyarrow engine parses the file multi-threaded
+        df = pd.read_csv(filepath, engine="pyarrow", dtype=RAW_DTYPES, na_values=RAW_NA_VALUES)
+    except ImportError:
+        logger.info("pyarrow is not installed, reading with the C engine")
+        df = pd.read_csv(filepath, low_memory=False, dtype=RAW_DTYPES, na_values=RAW_NA_VALUES)
     logger.info(f"Loaded dataframe with {len(df)} rows and {len(df.columns)} columns")
 
 
     # TODO: OPTIONAL Add data profiling here to understand the dataset
     # Suggestion: Log the datatypes of each column and the number of unique values
     # Example:
-    logger.info(f"Column datatypes: \n{df.dtypes}")
-    logger.info(f"Number of unique values: \n{df.nunique()}")
+    # nunique() hashes every column, so the profile is only computed when DEBUG logging is on
+    logger.opt(lazy=True).debug("Column datatypes: \n{}", lambda: df.dtypes)
+    logger.opt(lazy=True).debug("Number of unique values: \n{}", lambda: df.nunique())
     
     return df
 
+def fill_category(series: pd.Series, value: str) -> pd.Series:
+    """
+    Fill missing values of a categorical column, adding the fill value as a category if needed.
+
+    Args:
+        series (pd.Series): Categorical column.
+        value (str): Value to put in place of missing entries.
+    
+    Returns:
+        pd.Series: Column with missing values filled.
+    """
+    if value not in series.cat.categories:
+        series = series.cat.add_categories([value])
+    return series.fillna(value)
+
 def remove_duplicates(df: pd.DataFrame) -> pd.DataFrame:
     """
     Remove duplicate rows from the DataFrame.
@@ -107,26 +152,28 @@ def handle_missing_values(df: pd.DataFrame) -> pd.DataFrame:
     logger.info(f"FUNCTION START: handle_missing_values with dataframe shape={df.shape}")
     # Example: Fill missing values with the mean of the column
 
-    missing_by_col = df.isna().sum()
-    logger.info(f"Missing values by column before handling:\n{missing_by_col}")
+    logger.opt(lazy=True).debug("Missing values by column before handling:\n{}", lambda: df.isna().sum())
     
     #Convert SaleAmount column to float64 if not already
     df['SaleAmount'] = pd.to_numeric(df['SaleAmount'], errors='coerce')
     df['SaleAmount'] = df['SaleAmount'].fillna(0)
-    for column in df.select_dtypes(include=['float64', 'int64']).columns:
-        logger.info(f"Handling missing values for column: {column}")
-        mean_value = df[column].mean()
-        round_times = 0  if column == 'CampaignID' else 2  # Round CampaignID to 1 decimal places, others to 2
-        df[column].fillna(mean_value.round(round_times), inplace=True)
-        logger.info(f"Filled missing values in {column} with mean value {mean_value}")
-        df.loc[df[column] <= 0, column] = mean_value.round(round_times)  # Fill zero values with mean
-        logger.info(f"Filled zero values in {column} with mean value {mean_value}")
-
-    df['PaymentType'].fillna('Cash', inplace=True)  
+    # Replace missing and non-positive amounts with the column mean, for all float
+    # columns in one masked assignment. The nullable integer ID columns are keys, not measures, so they are skipped.
+    numeric_cols = df.select_dtypes(include='float64').columns
+    numeric = df[numeric_cols]
+    fill_values = numeric.mean().round(2)
+    df[numeric_cols] = numeric.mask(numeric.isna() | (numeric <= 0), fill_values, axis=1)
+    logger.info(f"Filled missing and non-positive values with column means:\n{fill_values}")
+
+    # A missing campaign gets the most common campaign
+    campaign_mode = df['CampaignID'].mode().iat[0]
+    df['CampaignID'] = df['CampaignID'].fillna(campaign_mode)
+    logger.info(f"Filled missing values in CampaignID with mode value {campaign_mode}")
+
+    df['PaymentType'] = fill_category(df['PaymentType'], 'Cash')
     df= df.dropna(subset=['SaleDate'])
     # Log missing values by column after handling
-    missing_by_col = df.isna().sum()
-    logger.info(f"Missing values by column after handling:\n{missing_by_col}")
+    logger.opt(lazy=True).debug("Missing values by column after handling:\n{}", lambda: df.isna().sum())
     logger.info(f"{len(df)} records remaining after handling missing values.")
     return df
 
@@ -142,14 +189,16 @@ def remove_outliers(df: pd.DataFrame) -> pd.DataFrame:
     """
     logger.info(f"FUNCTION START: remove_outliers with dataframe shape={df.shape}")
 
-    for column in df.select_dtypes(include=['float64', 'int64']).columns:
-        mean = df[column].mean()
-        std = df[column].std()
-        threshold = 3 * std
-        df = df[(df[column] >= (mean - threshold)) & (df[column] <= (mean + threshold))]
-        logger.info(f"Removed outliers based on Sales, new shape={df.shape}")
-    
-    df['TransactionID'] = np.floor(df['TransactionID']).astype(float)
+    # Take the mean and standard deviation of all numeric columns at once on one
+    # float64 matrix, build a single keep-mask and slice the frame once.
+    # The ID columns are included so that stray IDs (e.g. CustomerID 9999) are dropped.
+    numeric_cols = df.select_dtypes(include='number').columns
+    values = df[numeric_cols].to_numpy(dtype=np.float64, na_value=np.nan)
+    mean = np.nanmean(values, axis=0)
+    threshold = 3 * np.nanstd(values, axis=0, ddof=1)
+    keep = ((values >= (mean - threshold)) & (values <= (mean + threshold))).all(axis=1)
+    df = df[keep]
+    logger.info(f"Removed outliers based on Sales, new shape={df.shape}")
     return df
 
 def save_prepared_data(df: pd.DataFrame, file_name: str) -> pd.DataFrame:
@@ -165,7 +214,11 @@ def save_prepared_data(df: pd.DataFrame, file_name: str) -> pd.DataFrame:
     """
     logger.info(f"FUNCTION START: save_prepared_data with file_name={file_name}, dataframe shape={df.shape}")
     file_path = PREPARED_DATA_DIR.joinpath(file_name)
-    df.to_csv(file_path, index=False)
+    if pa is not None:
+        # pyarrow's C++ CSV writer is much faster than the pandas writer
+        pa_csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), file_path)
+    else:
+        df.to_csv(file_path, index=False)
     logger.info(f"Data saved to {file_path}")
     
     return df
@@ -201,13 +254,20 @@ def main() -> None:
     logger.info(f"Initial dataframe shape: {df.shape}")
     
     # Clean column names
-    original_columns = df.columns.tolist()
-    df.columns = df.columns.str.strip()
+    original_columns = df.columns.to_numpy()
+    df = df.rename(columns=str.strip)
     
     # Log if any column names changed
-    changed_columns = [f"{old} -> {new}" for old, new in zip(original_columns, df.columns) if old != new]
-    if changed_columns:
-        logger.info(f"Cleaned column names: {', '.join(changed_columns)}")
+    # Positions are found with one NumPy comparison; the message is only built if INFO is logged
+    changed = np.flatnonzero(original_columns != df.columns.to_numpy())
+    if changed.size:
+        logger.opt(lazy=True).info(
+            "Cleaned column names: {}",
+            lambda: ', '.join(f"{original_columns[i]} -> {df.columns[i]}" for i in changed),
+        )
+
+    # Store low-cardinality text columns as categoricals
+    df = df.astype({col: 'category' for col in CATEGORICAL_COLUMNS})
     
     df = handle_missing_values(df)
 
@@ -5,14 +5,19 @@ from utils.logger import logger
 
 class TestDataScrubber(unittest.TestCase):
     
-    def setUp(self):
-        # Sample data for testing
-        self.data = {
+    @classmethod
+    def setUpClass(cls):
+        # Sample data for testing, built once for the whole class
+        cls.data = {
             'ID': [1, 2, 3, 4, 5, 5, 6, 7],
             'Name': ["Ram", "Tom", "Jose", "Sam", "Bob", "Bob", "Kai", "Sai"],
             'Age': [20, 27, 44, 30, 57, 57, 47, 31]
         }
-        self.df = pd.DataFrame(self.data)
+        cls._df_template = pd.DataFrame(cls.data)
+
+    def setUp(self):
+        # Each test gets its own copy so changes made by one test do not leak into another
+        self.df = self._df_template.copy()
         self.scrubber = DataScrubber(self.df)
 
     def test_convert_column_to_new_data_type(self):
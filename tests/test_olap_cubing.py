@@ -0,0 +1,117 @@
+import pathlib
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+
+# olap_cubing.py is a script, not a package module, so import it from its folder
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent.joinpath("scripts", "OLAP")))
+
+import olap_cubing  # noqa: E402
+
+
+class TestOlapCubing(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Small sale table with two payment types across two years
+        cls.sales = [
+            (1, "Cash", 2023, 100.0),
+            (2, "Check", 2023, 250.5),
+            (3, "Cash", 2024, 75.25),
+            (4, "Cash", 2023, 20.0),
+            (5, "Check", 2024, 310.0),
+            (6, "Check", 2024, 15.75),
+        ]
+        cls.metrics = {"sale_amount": ["sum", "mean"], "sale_id": "count"}
+
+    def setUp(self):
+        # Point the module at a temporary warehouse without a Parquet snapshot,
+        # so the fallback path reads from SQLite as well
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        tmp_path = pathlib.Path(self.tmp_dir.name)
+        self.original_paths = (olap_cubing.DB_PATH, olap_cubing.SALE_PARQUET_PATH)
+        olap_cubing.DB_PATH = tmp_path.joinpath("smart_sales.db")
+        olap_cubing.SALE_PARQUET_PATH = tmp_path.joinpath("sale.parquet")
+
+        conn = sqlite3.connect(olap_cubing.DB_PATH)
+        conn.execute(
+            "CREATE TABLE sale (sale_id INTEGER, payment_type TEXT, sale_year INTEGER, sale_amount REAL)"
+        )
+        conn.executemany("INSERT INTO sale VALUES (?, ?, ?, ?)", self.sales)
+        conn.commit()
+        conn.close()
+        olap_cubing.get_dw_connection.cache_clear()
+
+    def tearDown(self):
+        if olap_cubing.get_dw_connection.cache_info().currsize:
+            olap_cubing.get_dw_connection().close()
+        olap_cubing.get_dw_connection.cache_clear()
+        olap_cubing.DB_PATH, olap_cubing.SALE_PARQUET_PATH = self.original_paths
+        self.tmp_dir.cleanup()
+
+    def build_both_cubes(self, dimensions):
+        pushed_down = olap_cubing.create_olap_cube_from_dw(dimensions, self.metrics)
+        columns = list(dict.fromkeys([*dimensions, *self.metrics, "sale_id"]))
+        sales_df = olap_cubing.ingest_sales_data_from_dw(columns)
+        in_memory = olap_cubing.create_olap_cube(sales_df, dimensions, self.metrics)
+        return pushed_down, in_memory
+
+    def assert_cubes_match(self, pushed_down, in_memory):
+        self.assertEqual(pushed_down.columns.tolist(), in_memory.columns.tolist())
+        pd.testing.assert_frame_equal(
+            pushed_down.drop(columns="sale_ids"),
+            in_memory.drop(columns="sale_ids"),
+            check_dtype=False,
+            check_exact=False,
+        )
+        self.assertEqual(pushed_down["sale_ids"].tolist(), in_memory["sale_ids"].tolist())
+
+    def test_single_dimension_paths_match(self):
+        pushed_down, in_memory = self.build_both_cubes(["payment_type"])
+        self.assert_cubes_match(pushed_down, in_memory)
+        self.assertEqual(pushed_down["payment_type"].tolist(), ["Cash", "Check"])
+        self.assertEqual(pushed_down["sale_amount_sum"].tolist(), [195.25, 576.25])
+        self.assertEqual(pushed_down["sale_id_count"].tolist(), [3, 3])
+        self.assertEqual(pushed_down["sale_ids"].tolist(), [[1, 3, 4], [2, 5, 6]])
+
+    def test_multi_dimension_paths_match(self):
+        pushed_down, in_memory = self.build_both_cubes(["payment_type", "sale_year"])
+        self.assert_cubes_match(pushed_down, in_memory)
+        self.assertEqual(len(pushed_down), 4)
+        self.assertEqual(pushed_down["sale_ids"].tolist(), [[1, 4], [3], [2], [5, 6]])
+        self.assertAlmostEqual(pushed_down["sale_amount_mean"].iloc[0], 60.0)
+
+    def test_build_olap_cube_query(self):
+        query = olap_cubing.build_olap_cube_query(["payment_type", "sale_year"], self.metrics)
+        self.assertEqual(
+            query,
+            "SELECT payment_type, sale_year, SUM(sale_amount) AS sale_amount_sum, "
+            "AVG(sale_amount) AS sale_amount_mean, COUNT(sale_id) AS sale_id_count "
+            "FROM sale GROUP BY payment_type, sale_year ORDER BY payment_type, sale_year",
+        )
+
+    def test_can_push_down(self):
+        self.assertTrue(olap_cubing.can_push_down(self.metrics))
+        self.assertFalse(olap_cubing.can_push_down({"sale_amount": ["sum", "median"]}))
+
+    def test_metric_aggregations(self):
+        self.assertEqual(
+            list(olap_cubing.metric_aggregations(self.metrics)),
+            [
+                ("sale_amount", "sum", "sale_amount_sum"),
+                ("sale_amount", "mean", "sale_amount_mean"),
+                ("sale_id", "count", "sale_id_count"),
+            ],
+        )
+
+    def test_collect_sale_ids(self):
+        ids_df = pd.DataFrame({"payment_type": ["Cash", "Cash", "Check"], "sale_id": [1, 4, 2]})
+        self.assertEqual(olap_cubing.collect_sale_ids(ids_df, ["payment_type"]), [[1, 4], [2]])
+        self.assertEqual(olap_cubing.collect_sale_ids(ids_df.iloc[:0], ["payment_type"]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,7 +8,9 @@ messages and errors both to a file and to the console.
 """
 
 # Imports from Python Standard Library
+import os
 import pathlib
+import sys
 
 # Imports from external packages
 from loguru import logger
@@ -18,15 +20,17 @@ CURRENT_SCRIPT = pathlib.Path(__file__).stem  # Gets the current file name witho
 PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent  # Navigate to the project's root directory
 LOG_FOLDER: pathlib.Path = PROJECT_ROOT.joinpath("logs")  # Directory where logs will be stored
 LOG_FILE: pathlib.Path = LOG_FOLDER.joinpath("project_log.log")  # Path to the log file
+LOG_LEVEL: str = os.environ.get("LOG_LEVEL", "INFO")  # Set LOG_LEVEL=DEBUG to include data profiling output
 
 # Ensure the log folder exists or create it
 LOG_FOLDER.mkdir(exist_ok=True)
 
-# Configure Loguru to write to the log file
-logger.add(LOG_FILE, level="INFO")
+# Replace Loguru's default DEBUG-level console handler so the console also uses LOG_LEVEL
+logger.remove()
+logger.add(sys.stderr, level=LOG_LEVEL)
 
-# Optionally, add console output for logging (Uncomment the following line if needed)
-# logger.add(sys.stderr, level="DEBUG")
+# Configure Loguru to write to the log file
+logger.add(LOG_FILE, level=LOG_LEVEL)
 
 
 def log_example() -> None: